@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The app runs as a script (`streamlit run voice_assistant/voice_assistant.py`), so its modules
+# import each other by bare name from that directory
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "voice_assistant"))
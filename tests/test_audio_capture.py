@@ -0,0 +1,103 @@
+import numpy as np
+
+from audio_capture import AudioBuffer, LiveTranscriber, MAX_RECORD_SECONDS, SILENCE_RMS, WHISPER_SAMPLE_RATE
+
+SR = WHISPER_SAMPLE_RATE
+
+class Frame:
+    """Stands in for the s16 mono av.AudioFrame the resampler hands to AudioBuffer.append"""
+    def __init__(self, pcm):
+        self.pcm = pcm
+
+    def to_ndarray(self):
+        return self.pcm.reshape(1, -1)
+
+def tone(seconds, rms):
+    t = np.arange(int(seconds * SR)) / SR
+    return (np.sqrt(2) * rms * np.sin(2 * np.pi * 220 * t) * 32767).astype(np.int16)
+
+def silence(seconds):
+    return np.zeros(int(seconds * SR), dtype=np.int16)
+
+def record(buffer, *parts, frame_seconds=0.02):
+    pcm = np.concatenate(parts)
+    step = int(frame_seconds * SR)
+    for i in range(0, len(pcm), step):
+        buffer.append(Frame(pcm[i:i + step]))
+
+def test_append_copies_frames_in_order_and_counts_them():
+    buffer = AudioBuffer()
+    record(buffer, np.arange(1000, dtype=np.int16), frame_seconds=0.02)
+    assert buffer.write == 1000
+    assert buffer.frames == 4
+    np.testing.assert_array_equal(buffer.buf[:1000], np.arange(1000))
+
+def test_append_drops_audio_past_the_capacity():
+    buffer = AudioBuffer()
+    buffer.write = buffer.buf.size - 10
+    buffer.append(Frame(np.ones(100, dtype=np.int16)))
+    assert buffer.write == MAX_RECORD_SECONDS * SR
+
+def test_samples_are_scaled_float32():
+    buffer = AudioBuffer()
+    buffer.append(Frame(np.array([-32768, 0, 16384], dtype=np.int16)))
+    samples = buffer.samples()
+    assert samples.dtype == np.float32
+    np.testing.assert_allclose(samples, [-1.0, 0.0, 0.5])
+    np.testing.assert_allclose(buffer.samples(1, 2), [0.0])
+
+def test_clear_resets_the_cursor():
+    buffer = AudioBuffer()
+    record(buffer, tone(0.5, 0.1))
+    buffer.clear()
+    assert buffer.write == 0 and buffer.frames == 0
+    assert len(buffer.samples()) == 0
+
+def test_speech_followed_by_a_pause_ends_an_utterance():
+    buffer = AudioBuffer()
+    transcriber = LiveTranscriber(buffer, lambda samples: ["hello"])
+    record(buffer, tone(2.0, 0.1), silence(1.0))
+    assert transcriber.poll()
+    assert transcriber.texts == ["hello"]
+    assert transcriber.committed == buffer.write - buffer.write % int(0.03 * SR)
+
+def test_speech_without_a_pause_is_left_pending():
+    buffer = AudioBuffer()
+    transcriber = LiveTranscriber(buffer, lambda samples: ["hello"])
+    record(buffer, tone(3.0, 0.1))
+    assert transcriber.utterance_end() == 0
+    assert transcriber.poll()
+    assert transcriber.committed == 0 and transcriber.texts == []
+
+def test_quiet_audio_is_never_skipped():
+    # About -49 dBFS: under the energy gate, but possibly speech from a low-gain mic
+    buffer = AudioBuffer()
+    transcriber = LiveTranscriber(buffer, lambda samples: ["quiet"])
+    for _ in range(6):
+        record(buffer, tone(0.5, SILENCE_RMS / 3))
+        assert transcriber.poll()
+    # All of it is still pending, so the transcription on STOP covers the whole recording
+    assert transcriber.committed == 0 and transcriber.texts == []
+
+def test_incremental_scans_match_a_single_scan():
+    pcm = [tone(1.2, 0.1), silence(0.3), tone(0.9, 0.1), silence(0.8)]
+    once = AudioBuffer()
+    record(once, *pcm)
+    whole = LiveTranscriber(once, list).utterance_end()
+    polled = AudioBuffer()
+    transcriber = LiveTranscriber(polled, list)
+    ends = []
+    for part in pcm:
+        record(polled, part)
+        ends.append(transcriber.utterance_end())
+    assert whole and ends[-1] == whole
+    assert ends[:-1] == [0, 0, 0]
+
+def test_failed_transcription_stops_the_loop_and_keeps_the_audio_pending():
+    buffer = AudioBuffer()
+    def fail(samples):
+        raise RuntimeError("model unavailable")
+    transcriber = LiveTranscriber(buffer, fail)
+    record(buffer, tone(2.0, 0.1), silence(1.0))
+    assert not transcriber.poll()
+    assert transcriber.committed == 0 and transcriber.texts == []
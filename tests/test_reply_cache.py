@@ -0,0 +1,65 @@
+from reply_cache import ReplyCache, CachedReply, trim_history
+
+KEY = ("hello", "model")
+
+def collect(cache, chunks, errors, complete):
+    reply = CachedReply(cache, KEY, chunks, "Test", lambda source, e: errors.append((source, e)))
+    parts = list(reply)
+    assert reply.complete is complete
+    return parts
+
+def failing_chunks(*parts):
+    yield from parts
+    raise RuntimeError("connection dropped")
+
+def test_miss_streams_and_caches_the_reply():
+    cache, errors = ReplyCache(), []
+    assert collect(cache, iter(["Hi", " there"]), errors, complete=True) == ["Hi", " there"]
+    assert cache.get(KEY) == "Hi there"
+    assert errors == []
+
+def test_hit_yields_the_cached_reply_without_consuming_chunks():
+    cache, errors = ReplyCache(), []
+    cache.put(KEY, "Hi there")
+    def chunks():
+        raise AssertionError("model was called on a cache hit")
+        yield
+    assert collect(cache, chunks(), errors, complete=True) == ["Hi there"]
+
+def test_exception_before_any_chunk_yields_a_warning_and_caches_nothing():
+    cache, errors = ReplyCache(), []
+    assert collect(cache, failing_chunks(), errors, complete=False) == ["⚠️ Could not get a response from Test."]
+    assert cache.get(KEY) is None
+    assert [source for source, _ in errors] == ["Test"]
+
+def test_exception_mid_stream_keeps_the_partial_reply_uncached():
+    cache, errors = ReplyCache(), []
+    assert collect(cache, failing_chunks("Hi"), errors, complete=False) == ["Hi"]
+    assert cache.get(KEY) is None
+    assert len(errors) == 1
+
+def test_empty_stream_yields_a_warning_and_caches_nothing():
+    cache, errors = ReplyCache(), []
+    assert collect(cache, iter([]), errors, complete=False) == ["⚠️ No response from Test."]
+    assert cache.get(KEY) is None
+    # The next request goes to the model again instead of replaying the warning
+    assert collect(cache, iter(["Hi"]), errors, complete=True) == ["Hi"]
+    assert cache.get(KEY) == "Hi"
+
+def turn(role, length):
+    return {"role": role, "content": "x" * length}
+
+def test_trim_history_keeps_everything_within_the_budget():
+    history = [turn("user", 10), turn("assistant", 10)]
+    assert trim_history(history, 20) == history
+
+def test_trim_history_drops_the_oldest_turns_first():
+    history = [turn("user", 100), turn("assistant", 100), turn("user", 10), turn("assistant", 10)]
+    assert trim_history(history, 50) == history[2:]
+
+def test_trim_history_starts_with_a_user_turn():
+    history = [turn("user", 100), turn("assistant", 10), turn("user", 10), turn("assistant", 10)]
+    assert trim_history(history, 35) == history[2:]
+
+def test_trim_history_with_no_budget_is_empty():
+    assert trim_history([turn("user", 10), turn("assistant", 10)], 0) == []
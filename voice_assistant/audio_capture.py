@@ -0,0 +1,103 @@
+import logging
+import threading
+import numpy as np
+
+logger = logging.getLogger("voice_assistant")
+
+# Longest recording kept in the capture buffer
+MAX_RECORD_SECONDS = 300
+# Whisper works on 16 kHz mono audio
+WHISPER_SAMPLE_RATE = 16000
+# Live transcription: a pause this long after at least LIVE_MIN_SECONDS of audio ends an utterance
+LIVE_POLL_SECONDS = 0.5
+LIVE_MIN_SECONDS = 2.0
+LIVE_PAUSE_SECONDS = 0.6
+# RMS level (about -40 dBFS) below which an RMS window counts as silence
+SILENCE_RMS = 0.01
+RMS_WINDOW_SECONDS = 0.03
+
+class AudioBuffer:
+    """Preallocated buffer of 16 kHz mono int16 samples, the rate Whisper works at"""
+    def __init__(self):
+        self.buf = np.empty(MAX_RECORD_SECONDS * WHISPER_SAMPLE_RATE, dtype=np.int16)
+        self.write = 0
+        self.frames = 0
+
+    def append(self, frame):
+        """Copy one s16 mono frame from the AudioProcessor's resampler into the buffer"""
+        pcm = frame.to_ndarray().reshape(-1)
+        # Drop anything past MAX_RECORD_SECONDS rather than reallocating
+        n = min(pcm.size, self.buf.size - self.write)
+        self.buf[self.write:self.write + n] = pcm[:n]
+        self.write += n
+        self.frames += 1
+
+    def samples(self, start=0, end=None):
+        """Float32 samples in [-1, 1], converted from int16 in one pass"""
+        samples = self.buf[start:self.write if end is None else end].astype(np.float32)
+        samples *= 1.0 / 32768
+        return samples
+
+    def clear(self):
+        self.write = 0
+        self.frames = 0
+
+class LiveTranscriber(threading.Thread):
+    """Transcribe each finished utterance in an AudioBuffer while recording continues"""
+    def __init__(self, audio_buffer, transcribe):
+        super().__init__(daemon=True)
+        self.audio_buffer = audio_buffer
+        self.transcribe = transcribe  # 16 kHz float32 samples -> iterable of segment texts
+        self.committed = 0  # buffer index up to which audio has been transcribed
+        self.silent = np.zeros(0, dtype=bool)  # per-window silence flags for the audio after committed
+        self.texts = []
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(LIVE_POLL_SECONDS):
+            if not self.poll():
+                break
+
+    def poll(self):
+        """Transcribe the pending audio if it ends an utterance; False once transcription fails"""
+        end = self.utterance_end()
+        if not end:
+            return True
+        try:
+            texts = list(self.transcribe(self.audio_buffer.samples(self.committed, end)))
+        except Exception as e:
+            # No Streamlit context on this thread; everything from self.committed is retried on stop
+            logger.error("Live Transcription Error: %s", e)
+            return False
+        self.texts.extend(texts)
+        self.committed = end
+        self.silent = self.silent[:0]
+        return True
+
+    def utterance_end(self):
+        """Buffer index where the pending audio ends in a pause after speech, or 0 if it does not yet"""
+        # The energy gate only decides where to cut: audio is never dropped here, however quiet,
+        # so Whisper's VAD has the final say over what is silence
+        window = int(WHISPER_SAMPLE_RATE * RMS_WINDOW_SECONDS)
+        # Only windows that arrived since the last poll are converted and measured
+        scanned = self.committed + len(self.silent) * window
+        fresh = self.audio_buffer.samples(scanned)
+        n = len(fresh) // window
+        if n:
+            frames = fresh[:n * window].reshape(n, window)
+            self.silent = np.concatenate([self.silent, np.sqrt(np.mean(np.square(frames), axis=1)) < SILENCE_RMS])
+        if len(self.silent) * window < LIVE_MIN_SECONDS * WHISPER_SAMPLE_RATE:
+            return 0
+        pause = int(LIVE_PAUSE_SECONDS / RMS_WINDOW_SECONDS)
+        if self.silent.all() or not self.silent[-pause:].all():
+            return 0
+        return self.committed + len(self.silent) * window
+
+    def stop(self):
+        self.stopped.set()
+
+    def finish(self):
+        """Stop the loop and return the buffer index where the untranscribed tail starts"""
+        self.stop()
+        self.join()
+        return self.committed
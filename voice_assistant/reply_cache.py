@@ -0,0 +1,69 @@
+import threading
+import cachetools
+
+class ReplyCache:
+    """Completed LLM replies keyed by the request that produced them, shared by every session"""
+    def __init__(self, maxsize=256, ttl=3600):
+        self.lock = threading.Lock()
+        self.replies = cachetools.TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, key):
+        with self.lock:
+            return self.replies.get(key)
+
+    def put(self, key, reply):
+        with self.lock:
+            self.replies[key] = reply
+
+    def clear(self):
+        with self.lock:
+            self.replies.clear()
+
+class CachedReply:
+    """Iterate over a reply's chunks: a cached reply whole, or a fresh one cached once it completes.
+    complete is set only when a full reply was yielded, so warnings never enter the history"""
+    def __init__(self, cache, key, chunks, source, on_error):
+        self.cache = cache
+        self.key = key
+        self.chunks = chunks
+        self.source = source
+        self.on_error = on_error
+        self.complete = False
+
+    def __iter__(self):
+        cached = self.cache.get(self.key)
+        if cached is not None:
+            self.complete = True
+            yield cached
+            return
+        parts = []
+        try:
+            for chunk in self.chunks:
+                parts.append(chunk)
+                yield chunk
+        except Exception as e:
+            # Partial or failed replies are never cached
+            self.on_error(self.source, e)
+            if not parts:
+                yield f"⚠️ Could not get a response from {self.source}."
+            return
+        if not parts:
+            # Neither is an empty one, so the next request asks the model again
+            yield f"⚠️ No response from {self.source}."
+            return
+        self.cache.put(self.key, "".join(parts))
+        self.complete = True
+
+def trim_history(history, max_chars):
+    """The most recent messages whose contents fit in max_chars, starting with a user turn"""
+    kept, total = [], 0
+    for msg in reversed(history):
+        total += len(msg["content"])
+        if total > max_chars:
+            break
+        kept.append(msg)
+    kept.reverse()
+    # Dropping the oldest messages can leave a reply without its question
+    while kept and kept[0]["role"] != "user":
+        kept.pop(0)
+    return kept
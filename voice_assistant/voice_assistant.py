@@ -2,156 +2,344 @@ import streamlit as st
 from streamlit_webrtc import webrtc_streamer, AudioProcessorBase, WebRtcMode
 import av
 import numpy as np
-import wave
-import tempfile
 from dotenv import load_dotenv
 import pyttsx3
-import whisper
+from faster_whisper import WhisperModel, BatchedInferencePipeline
+import ctranslate2
 import requests
 import os
-from openai import OpenAI
+from openai import OpenAI, DefaultHttpxClient
+import httpx
 import logging
+import logging.handlers
 import threading
-logging.basicConfig(filename="app_errors.log", level=logging.ERROR, format="%(asctime)s - %(levelname)s - %(message)s")
+import queue
+from collections import deque
+import json
+import tempfile
+from reply_cache import ReplyCache, CachedReply, trim_history
+from audio_capture import AudioBuffer, LiveTranscriber, WHISPER_SAMPLE_RATE
+from concurrent.futures import Future
+
+@st.cache_resource
+def start_log_listener():
+    """Queue log records and write them to app_errors.log on a background thread, once per process"""
+    root = logging.getLogger()
+    # Clearing st.cache_resource runs this again; the listener from the first run is still draining
+    # the queue, so a second handler would only write every record twice
+    if any(isinstance(handler, logging.handlers.QueueHandler) for handler in root.handlers):
+        return
+    log_queue = queue.Queue(-1)
+    file_handler = logging.FileHandler("app_errors.log")
+    file_handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+    # Logging calls on the script and worker threads only enqueue; the listener does the disk I/O
+    logging.handlers.QueueListener(log_queue, file_handler).start()
+    # Libraries (httpx, urllib3, faster_whisper) log through the root logger and stay at ERROR
+    root.setLevel(logging.ERROR)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+
+start_log_listener()
+# The app's own records; set to logging.DEBUG for capture and transcription details
+logger = logging.getLogger("voice_assistant")
+logger.setLevel(logging.ERROR)
 
 load_dotenv()
 
-# Improved AudioProcessor with proper state management
+# Shortest recording worth sending to Whisper
+MIN_RECORD_SECONDS = 0.5
+# Speech chunks decoded together by the batched Whisper pipeline
+WHISPER_BATCH_SIZE = 8
+# Longest wait for the TTS worker to render a reply
+TTS_TIMEOUT_SECONDS = 60
+# Rendered speech is written to RAM-backed tmpfs where available, otherwise the default temp dir
+SPEECH_TEMP_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+# Messages kept in the conversation history (user and assistant turns count separately)
+MAX_HISTORY_MESSAGES = 50
+# Chat models used for replies
+OPENAI_MODEL = "gpt-3.5-turbo"
+OLLAMA_MODEL = "mistral"
+# Fixed first message of every OpenAI request, so the provider can cache the shared prompt prefix
+OPENAI_SYSTEM_PROMPT = "You are a exceptionally talented assistant in a meeting"
+# Characters of prompt plus history sent to OpenAI (about 10k tokens), leaving room in the
+# 16k-token context window for the reply; the oldest turns are dropped first
+OPENAI_CONTEXT_CHARS = 40000
+# How long an idle OpenAI connection is kept open for the next turn
+OPENAI_KEEPALIVE_SECONDS = 120
+
+# AudioProcessor runs on the WebRTC worker thread, so it keeps its own buffer and never touches
+# st.session_state; the script publishes the buffer to session state while recording
 class AudioProcessor(AudioProcessorBase):
     def __init__(self):
-        self.lock = threading.Lock()
-        # Initialize audio_frames if not exists
-        if "audio_frames" not in st.session_state:
-            st.session_state.audio_frames = []
+        # Downmix and resample each frame to what Whisper expects as it arrives, so the buffer
+        # is model-ready when recording stops and a third the size of 48 kHz capture
+        self.resampler = av.AudioResampler(format="s16", layout="mono", rate=WHISPER_SAMPLE_RATE)
+        self.audio_buffer = AudioBuffer()
+        # Transcribe finished utterances while the recording is still running
+        self.transcriber = LiveTranscriber(self.audio_buffer, iter_transcript)
+        self.transcriber.start()
+        
+    def on_ended(self):
+        self.transcriber.stop()
         
     def recv(self, frame: av.AudioFrame) -> av.AudioFrame:
-        with self.lock:
-            try:
-                # Convert frame to numpy array
-                audio = frame.to_ndarray()
-                
-                # Ensure audio_frames exists in session state
-                if "audio_frames" not in st.session_state:
-                    st.session_state.audio_frames = []
-                
-                # Store the audio frame
-                st.session_state.audio_frames.append(audio)
-                
-                # Debug: Print frame info occasionally
-                if len(st.session_state.audio_frames) % 100 == 0:
-                    print(f"Audio frames recorded: {len(st.session_state.audio_frames)}")
-                    
-            except Exception as e:
-                print(f"Error in AudioProcessor.recv: {e}")
-                
+        # No lock: recv is the only writer, and append advances the write cursor only after the
+        # samples are in place, so readers never see a half-written frame
+        try:
+            # The resampler may hold samples back, returning zero or more frames
+            for resampled in self.resampler.resample(frame):
+                self.audio_buffer.append(resampled)
+        except Exception as e:
+            logger.error("Error in AudioProcessor.recv: %s", e)
+            
         return frame
 
-def save_audio(frames, sample_rate=48000):
-    """Convert audio frames to WAV file"""
-    temp_path = tempfile.NamedTemporaryFile(suffix=".wav", delete=False).name
-    with wave.open(temp_path, "wb") as wf:
-        wf.setnchannels(1)
-        wf.setsampwidth(2)
-        wf.setframerate(sample_rate)
+    async def recv_queued(self, frames: list[av.AudioFrame]) -> list[av.AudioFrame]:
+        # With async_processing the base class hands only the newest frame to recv and drops the
+        # backlog, which the resampler would then splice over; capture every queued frame instead
         for frame in frames:
-            # Ensure proper data type conversion
-            audio_data = np.array(frame, dtype=np.float32)
-            # Normalize to int16 range
-            audio_data = np.clip(audio_data * 32767, -32768, 32767).astype(np.int16)
-            wf.writeframes(audio_data.tobytes())
-    return temp_path
-
-def transcribe_audio(audio_path):
+            self.recv(frame)
+        return frames
+
+def build_whisper_pipeline(device, compute_type, **kwargs):
+    """Load Whisper base on one device behind a batched pipeline and warm it up"""
+    model = WhisperModel("base", device=device, compute_type=compute_type, num_workers=1, **kwargs)
+    pipeline = BatchedInferencePipeline(model=model)
+    # Run a second of silence through once so kernel selection and allocator warmup happen
+    # behind the loading spinner instead of on the first recording
+    silence = np.zeros(WHISPER_SAMPLE_RATE, dtype=np.float32)
+    segments, _ = model.transcribe(silence, beam_size=1)
+    list(segments)
+    # VAD finds no speech in silence, so this call skips the decoder, but it loads the Silero VAD
+    # model that faster-whisper otherwise loads lazily on the first real transcription
+    segments, _ = pipeline.transcribe(silence, beam_size=1, vad_filter=True, batch_size=WHISPER_BATCH_SIZE)
+    list(segments)
+    return pipeline
+
+@st.cache_resource(show_spinner="🔄 Loading Whisper model...")
+def load_whisper_model():
+    """Whisper base with int8 weights: fp16 compute on a CUDA GPU, falling back to the CPU"""
+    if ctranslate2.get_cuda_device_count() > 0:
+        try:
+            return build_whisper_pipeline("cuda", "int8_float16")
+        except Exception as e:
+            # A visible GPU without the cuBLAS 12 / cuDNN 9 runtime fails on load or on the warmup's first decode
+            logger.error("Whisper CUDA Error, using the CPU instead: %s", e)
+    return build_whisper_pipeline("cpu", "int8", cpu_threads=os.cpu_count())
+
+def iter_transcript(audio):
+    """Yield the text of each segment as Whisper decodes it"""
+    # VAD drops silence and splits the speech into chunks that are decoded in batches; segments arrive lazily.
+    # The batched pipeline's VAD defaults already cut pauses from 160 ms up, so they are left as they are
+    segments, _ = whisper_model.transcribe(audio, beam_size=1, vad_filter=True, batch_size=WHISPER_BATCH_SIZE)
+    for segment in segments:
+        yield segment.text.strip()
+
+def transcribe_audio(audio, placeholder=None):
+    """Transcribe an audio file or 16 kHz samples, painting the partial transcript as each segment is decoded"""
     try:
-        result = whisper_model.transcribe(audio_path)
-        return result['text'].strip()
+        texts = []
+        for text in iter_transcript(audio):
+            texts.append(text)
+            if placeholder is not None:
+                placeholder.markdown(" ".join(texts))
+        return " ".join(texts).strip()
     except Exception as e:
         log_and_alert_error("Transcription", e)
         return None
-   
-def get_openai_response(prompt, api_key):
+
+@st.cache_resource
+def get_openai_client(api_key):
+    """One OpenAI client per key so its connection pool is reused across calls"""
+    # HTTP/2 multiplexes requests over one kept-alive TLS connection instead of reconnecting per turn;
+    # httpx closes idle connections after 5 s by default, shorter than recording and reading a reply
+    limits = httpx.Limits(max_keepalive_connections=4, keepalive_expiry=OPENAI_KEEPALIVE_SECONDS)
+    http_client = DefaultHttpxClient(http2=True, limits=limits)
+    return OpenAI(api_key=api_key, http_client=http_client)
+
+@st.cache_resource
+def get_http_session():
+    """Keep-alive session shared by the Ollama health check and generate calls"""
+    return requests.Session()
+
+@st.cache_data(ttl=60, show_spinner=False)
+def ollama_up():
+    """Whether the local Ollama server answers; rechecked at most every 60 s instead of on every rerun"""
     try:
-        client = OpenAI(api_key=api_key)
-        completion = client.chat.completions.create(
-            model='gpt-3.5-turbo',
-            messages=[
-                {"role": "system", "content": "You are a exceptionally talented assistant in a meeting"},
-                {"role": "user", "content": prompt}
-            ]
-        )
-        return completion.choices[0].message.content
-    except Exception as e:
-        log_and_alert_error("OpenAI", e)
-        return "⚠️ Could not get a response from OpenAI."
+        # Localhost either accepts almost immediately or not at all
+        get_http_session().get("http://localhost:11434", timeout=0.5)
+        return True
+    except requests.exceptions.RequestException:
+        return False
+   
+@st.cache_resource
+def get_reply_cache():
+    return ReplyCache()
+
+def openai_chunks(prompt, history, model_name, api_key):
+    # System prompt, then earlier turns oldest first: every request starts with the previous one,
+    # so OpenAI's automatic prompt caching can reuse the prefix instead of reprocessing it
+    stream = get_openai_client(api_key).chat.completions.create(
+        model=model_name,
+        messages=[
+            {"role": "system", "content": OPENAI_SYSTEM_PROMPT},
+            *history,
+            {"role": "user", "content": prompt}
+        ],
+        stream=True
+    )
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+def ollama_chunks(prompt, model_name):
+    with get_http_session().post(
+        "http://localhost:11434/api/generate",
+        json={
+            "model": model_name,
+            "prompt": f"You are an assistant in a meeting. Respond to this: {prompt}",
+            "stream": True
+        },
+        stream=True
+    ) as res:
+        res.raise_for_status()
+        # One JSON object per line, the last one carrying "done": true
+        for line in res.iter_lines():
+            if line:
+                chunk = json.loads(line).get("response")
+                if chunk:
+                    yield chunk
+
+def get_openai_response(prompt, history, api_key):
+    """Stream the OpenAI reply chunk by chunk, with the conversation so far as context"""
+    history = trim_history(list(history), max(0, OPENAI_CONTEXT_CHARS - len(prompt)))
+    # The reply depends on the earlier turns too, so a cached one is only reused for the same
+    # conversation: a follow-up never gets an answer written for another session's history
+    key = (tuple((msg["role"], msg["content"]) for msg in history), prompt, OPENAI_MODEL)
+    chunks = openai_chunks(prompt, history, OPENAI_MODEL, api_key)
+    return CachedReply(get_reply_cache(), key, chunks, "OpenAI", log_and_alert_error)
 
 def get_ollama_response(prompt):
+    """Stream the Ollama reply chunk by chunk"""
+    chunks = ollama_chunks(prompt, OLLAMA_MODEL)
+    return CachedReply(get_reply_cache(), (prompt, OLLAMA_MODEL), chunks, "Ollama", log_and_alert_error)
+
+def tts_worker(speech_queue):
+    """Own the pyttsx3 engine on one background thread and render queued replies to WAV bytes"""
+    engine, init_error = None, None
     try:
-        res = requests.post(
-            "http://localhost:11434/api/generate",
-            json={
-                "model": "mistral",
-                "prompt": f"You are an assistant in a meeting. Respond to this: {prompt}",
-                "stream": False
-            }
-        )
-        res.raise_for_status()
-        return res.json().get("response", "⚠️ No response from local model.")
+        if os.name == "nt":
+            # SAPI5 needs COM initialised on the thread that drives it
+            import comtypes
+            comtypes.CoInitialize()
+        engine = pyttsx3.init()
     except Exception as e:
-        log_and_alert_error("Ollama", e)
-        return "⚠️ Could not get a response from Ollama."
+        logger.error("TTS Error: %s", e)
+        init_error = e
+    while True:
+        text, result = speech_queue.get()
+        if engine is None:
+            result.set_exception(init_error)
+            continue
+        try:
+            fd, audio_path = tempfile.mkstemp(suffix=".wav", dir=SPEECH_TEMP_DIR)
+            os.close(fd)
+            try:
+                engine.save_to_file(text, audio_path)
+                engine.runAndWait()
+                with open(audio_path, "rb") as f:
+                    result.set_result(f.read())
+            finally:
+                os.remove(audio_path)
+        except Exception as e:
+            result.set_exception(e)
+
+@st.cache_resource
+def get_speech_queue():
+    """Start the TTS worker once per process and return the queue feeding it"""
+    speech_queue = queue.Queue()
+    threading.Thread(target=tts_worker, args=(speech_queue,), daemon=True).start()
+    return speech_queue
 
 def speak_text(text):
+    """Synthesise the reply on the TTS worker and play it in the browser"""
+    result = Future()
+    get_speech_queue().put((text, result))
     try:
-        tts_engine.say(text)
-        tts_engine.runAndWait()
+        # Rendering to a file takes a fraction of the spoken duration
+        with st.spinner("🔊 Preparing speech..."):
+            audio_bytes = result.result(timeout=TTS_TIMEOUT_SECONDS)
+        st.audio(audio_bytes, format="audio/wav", autoplay=True)
     except Exception as e:
         log_and_alert_error("TTS", e)
 
 def log_and_alert_error(source, exception):
     st.error(f"{source} Error: {exception}")
-    logging.error(f"{source} Error: %s", exception)
+    logger.error(f"{source} Error: %s", exception)
 
 def handle_transcript(user_text, openai_key, use_openai):
     st.text_area("🎧 Transcript:", user_text, height=150)
-    with st.spinner("🤖 Generating reply..."):
-        reply = get_openai_response(user_text, openai_key) if use_openai else get_ollama_response(user_text)
+
+    st.success("🤖 Assistant:")
+    # Paint the reply as it is generated instead of waiting for the full completion
+    if use_openai:
+        reply_stream = get_openai_response(user_text, st.session_state.history, openai_key)
+    else:
+        reply_stream = get_ollama_response(user_text)
+    reply = st.write_stream(iter(reply_stream))
+    if not reply_stream.complete:
+        # A warning or a cut-off reply is shown, but kept out of the history sent as context
+        return None
 
     st.session_state.history.append({"role": "user", "content": user_text})
     st.session_state.history.append({"role": "assistant", "content": reply})
 
+    if st.button("🔊 Speak it"):
+        speak_text(reply)
+    return reply
+
+def show_answered_transcript(user_text, reply):
+    """Repaint a transcript that was already answered, without asking the model again"""
+    st.text_area("🎧 Transcript:", user_text, height=150)
     st.success("🤖 Assistant:")
-    st.write(reply)
+    st.markdown(reply)
 
     if st.button("🔊 Speak it"):
         speak_text(reply)
 
 def process_recorded_audio():
     """Process recorded audio frames and transcribe"""
-    if "audio_frames" in st.session_state and st.session_state.audio_frames:
+    audio_buffer = st.session_state.audio_buffer
+    # Stop live transcription before the buffer is read or cleared
+    texts, tail_start = [], 0
+    if st.session_state.live_transcriber is not None:
+        tail_start = st.session_state.live_transcriber.finish()
+        texts = list(st.session_state.live_transcriber.texts)
+        st.session_state.live_transcriber = None
+    if audio_buffer.write:
         try:
-            print(f"Processing {len(st.session_state.audio_frames)} audio frames...")
+            logger.debug("Processing %d audio frames...", audio_buffer.frames)
             
-            # Save audio frames to file
-            audio_path = save_audio(st.session_state.audio_frames)
-            print(f"Audio saved to: {audio_path}")
+            # Check recording length
+            duration = audio_buffer.write / WHISPER_SAMPLE_RATE
+            logger.debug("Recorded audio: %.1f s", duration)
             
-            # Check file size
-            file_size = os.path.getsize(audio_path)
-            print(f"Audio file size: {file_size} bytes")
-            
-            if file_size < 1000:  # Less than 1KB indicates very short/empty audio
-                st.warning("⚠️ Audio file is very small. Please record for at least 2-3 seconds.")
-                os.remove(audio_path)
-                st.session_state.audio_frames = []
+            if duration < MIN_RECORD_SECONDS:
+                st.warning("⚠️ Recording is very short. Please record for at least 2-3 seconds.")
+                audio_buffer.clear()
                 return None
             
-            # Transcribe audio
-            user_text = transcribe_audio(audio_path)
-            print(f"Transcription result: {user_text}")
+            # Utterances finished during recording are already transcribed; only the tail is left
+            tail = audio_buffer.samples(tail_start)
+            if len(tail):
+                live_transcript = st.empty()
+                live_transcript.markdown(" ".join(texts))
+                texts.append(transcribe_audio(tail) or "")
+                live_transcript.empty()
+            user_text = " ".join(texts)
+            logger.debug("Transcription result: %r", user_text)
             
             # Clean up
-            os.remove(audio_path)
-            st.session_state.audio_frames = []  # Clear frames
+            audio_buffer.clear()  # Clear frames
             
             if user_text and user_text.strip():
                 return user_text.strip()
@@ -160,7 +348,7 @@ def process_recorded_audio():
                 return None
         except Exception as e:
             log_and_alert_error("Audio Processing", e)
-            st.session_state.audio_frames = []  # Clear frames on error
+            audio_buffer.clear()  # Clear frames on error
             return None
     else:
         st.warning("⚠️ No audio frames recorded. Please record some audio first.")
@@ -172,18 +360,23 @@ st.title("🧠 Voice Assistant Agent")
 
 # Initialize session state
 if "history" not in st.session_state:
-    st.session_state.history = []
-if "audio_frames" not in st.session_state:
-    st.session_state.audio_frames = []
+    st.session_state.history = deque(maxlen=MAX_HISTORY_MESSAGES)
+if "audio_buffer" not in st.session_state:
+    st.session_state.audio_buffer = AudioBuffer()
 if "recording_state" not in st.session_state:
     st.session_state.recording_state = "stopped"
 if "current_transcript" not in st.session_state:
     st.session_state.current_transcript = None
+if "live_transcriber" not in st.session_state:
+    st.session_state.live_transcriber = None
+if "upload_transcripts" not in st.session_state:
+    st.session_state.upload_transcripts = {}  # file_id -> transcript
+if "answered_uploads" not in st.session_state:
+    st.session_state.answered_uploads = None  # (file_ids, reply) for the uploads last sent to the model
 
 # Load models
 try:
-    tts_engine = pyttsx3.init()
-    whisper_model = whisper.load_model("base")
+    whisper_model = load_whisper_model()
 except Exception as e:
     st.error(f"❌ Failed to initialize models: {e}")
     st.stop()
@@ -196,11 +389,8 @@ openai_key = os.getenv("OPENAI_API_KEY") if use_openai else ""
 # If OpenAI, ask for API key
 if use_openai and not openai_key:
     st.warning("🔐 API key not found in .env file.")
-elif not use_openai:
-    try:
-        requests.get("http://localhost:11434", timeout=5)
-    except requests.exceptions.RequestException:
-        st.error("⚠️ Ollama is not running. Please run `ollama run mistral` in a terminal.")
+elif not use_openai and not ollama_up():
+    st.error("⚠️ Ollama is not running. Please run `ollama run mistral` in a terminal.")
 
 # Recording section
 st.markdown("### 🎙️ Record Audio")
@@ -228,12 +418,20 @@ if webrtc_ctx.state.playing:
     st.session_state.recording_state = "recording"
     # Clear any previous transcript while recording
     st.session_state.current_transcript = None
+    # The processor is gone once the stream stops, so keep hold of its buffer now
+    if webrtc_ctx.audio_processor:
+        st.session_state.audio_buffer = webrtc_ctx.audio_processor.audio_buffer
+        transcriber = webrtc_ctx.audio_processor.transcriber
+        # "Clear Audio Buffer" stops the transcriber, whose progress then refers to audio that is gone;
+        # leaving it unpublished makes the transcription on STOP start from the beginning of the buffer
+        if not transcriber.stopped.is_set():
+            st.session_state.live_transcriber = transcriber
     
 elif st.session_state.recording_state == "recording":
     # Recording just stopped - automatically process
     st.session_state.recording_state = "processing"
     
-    if st.session_state.audio_frames:
+    if st.session_state.audio_buffer.write:
         st.info("� Recording stopped. Processing audio...")
         
         # Automatically process the recorded audio
@@ -267,12 +465,15 @@ else:
     st.session_state.recording_state = "stopped"
 
 # Show recording status
-frames_count = len(st.session_state.audio_frames) if st.session_state.audio_frames else 0
+frames_count = st.session_state.audio_buffer.frames
 if frames_count > 0:
     st.info(f"📊 Audio buffer: {frames_count} frames recorded")
     # Add clear button when frames exist
     if st.button("🗑️ Clear Audio Buffer"):
-        st.session_state.audio_frames = []
+        if st.session_state.live_transcriber is not None:
+            st.session_state.live_transcriber.stop()
+            st.session_state.live_transcriber = None
+        st.session_state.audio_buffer.clear()
         st.session_state.recording_state = "stopped"
         st.session_state.current_transcript = None
         st.rerun()
@@ -283,32 +484,61 @@ else:
 
 # Upload audio
 st.markdown("### 📁 Upload Audio File")
-uploaded_audio = st.file_uploader("🎙️ Upload meeting audio", type=["mp3", "wav", "m4a"])
-
-if uploaded_audio:
-    with st.spinner("🔄 Transcribing..."):
-        ext = uploaded_audio.name.split('.')[-1]
-        audio_path = f"temp.{ext}"
-        with open(audio_path, "wb") as f:
-            f.write(uploaded_audio.read())
-        
-        user_text = transcribe_audio(audio_path)
-        os.remove(audio_path)
+uploaded_files = st.file_uploader("🎙️ Upload meeting audio", type=["mp3", "wav", "m4a"], accept_multiple_files=True)
+
+if uploaded_files:
+    # Every widget interaction reruns the script, so each upload is transcribed once and the
+    # model is only asked again when the set of uploads changes
+    upload_ids = tuple(uploaded_audio.file_id for uploaded_audio in uploaded_files)
+    known = st.session_state.upload_transcripts
+    pending = [uploaded_audio for uploaded_audio in uploaded_files if uploaded_audio.file_id not in known]
+    if pending:
+        with st.spinner("🔄 Transcribing..."):
+            live_transcript = st.empty()
+            for uploaded_audio in pending:
+                # faster-whisper decodes file-like objects directly, so the upload never touches disk
+                uploaded_audio.seek(0)
+                # A failed transcription is remembered as empty rather than retried, and reported once
+                known[uploaded_audio.file_id] = transcribe_audio(uploaded_audio, live_transcript) or ""
+            live_transcript.empty()
+    # Forget uploads that have been removed from the uploader
+    st.session_state.upload_transcripts = {file_id: known[file_id] for file_id in upload_ids if file_id in known}
+
+    transcripts = []
+    for uploaded_audio in uploaded_files:
+        text = known[uploaded_audio.file_id]
+        if text:
+            transcripts.append(text if len(uploaded_files) == 1 else f"[{uploaded_audio.name}] {text}")
+    user_text = "\n\n".join(transcripts)
 
     if user_text:
-        handle_transcript(user_text, openai_key, use_openai)
+        answered = st.session_state.answered_uploads
+        if answered is not None and answered[0] == upload_ids:
+            show_answered_transcript(user_text, answered[1])
+        else:
+            reply = handle_transcript(user_text, openai_key, use_openai)
+            if reply is not None:
+                st.session_state.answered_uploads = (upload_ids, reply)
 
 # Show chat history
 if st.session_state.history:
     with st.expander("🗂️ Conversation History"):
-        for msg in st.session_state.history:
-            role = "🧑 You" if msg["role"] == "user" else "🤖 Assistant"
-            st.markdown(f"**{role}:** {msg['content']}")
+        # One markdown element for the whole history instead of one per message
+        st.markdown("\n\n".join(
+            f"**{'🧑 You' if msg['role'] == 'user' else '🤖 Assistant'}:** {msg['content']}"
+            for msg in st.session_state.history
+        ))
+        if st.button("🗑️ Clear Conversation History"):
+            st.session_state.history.clear()
+            get_reply_cache().clear()
+            st.rerun()
 
 # Debug section (can be removed in production)
 if st.checkbox("🔧 Debug Info"):
     st.write("**WebRTC State:**", webrtc_ctx.state.playing if webrtc_ctx else "None")
-    st.write("**Audio Frames Count:**", len(st.session_state.audio_frames))
+    st.write("**Audio Frames Count:**", st.session_state.audio_buffer.frames)
     st.write("**Recording State:**", st.session_state.recording_state)
     st.write("**Current Transcript:**", getattr(st.session_state, 'current_transcript', 'Not set'))
+    if st.session_state.live_transcriber is not None:
+        st.write("**Live Transcript:**", " ".join(st.session_state.live_transcriber.texts))
 